@@ -3,8 +3,12 @@
 from .fftshow import fftshow
 from .homomorphic_filter import homomorphic_filter
 from .fourier_filters import (
+    FourierFilter,
     ideal_low_pass, ideal_high_pass,
     butterworth_low_pass, butterworth_high_pass,
     gaussian, gaussian_low_pass, gaussian_high_pass)
-from .utils import nonzero, psf2otf, otf2psf, cos
+from .utils import (
+    nonzero, psf2otf, otf2psf, cos, corner_cosines, polygon_cosines, squareness,
+    set_default_dtype, get_default_dtype)
+from .reconstruction import filtered_back_projection
 from .zerocross import zerocross
@@ -0,0 +1,310 @@
+"""
+Batch processing of directories of images with a pipeline of functions from this package.
+
+A pipeline is a list of steps, each of which is a name of a known step (see STEPS), a name and a
+dictionary of keyword arguments, or a (picklable) function with or without keyword arguments. The
+output of each step is given to the next step. For example:
+
+    run_batch([('homomorphic_filter', {'cutoff': 10}), ('gaussian_laplace', {'sigma': 2}),
+               'zerocross'], 'images/', 'output/')
+    run_batch(['binarize', 'skeletonize', 'get_straight_skeleton',
+               ('collapse_short_edges', {'min_length': 5})], 'scans/*.png', 'edges/')
+
+The images are divided into chunks that are run in a pool of processes. Each process decodes the
+next images in the background while processing the current one and writes its results directly.
+Results that are boolean or uint8 images are saved as PNGs and everything else (such as edge
+arrays) is saved as a .npz file with a single array named "result". Every finished image is
+recorded in a manifest file in the output directory so an interrupted run can be resumed.
+
+This can also be used from the command line, see:
+    python -m ImageProcessingF2021.batch --help
+"""
+
+import os
+import json
+from time import perf_counter
+
+import numpy as np
+
+__all__ = ["STEPS", "binarize", "gaussian_laplace", "find_images", "run_batch"]
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp', '.gif')
+
+# Step names -> (module, function name); modules starting with . are in this package
+STEPS = {
+    'homomorphic_filter': ('.homomorphic_filter', 'homomorphic_filter'),
+    'zerocross': ('.zerocross', 'zerocross'),
+    'fftshow': ('.fftshow', 'fftshow'),
+    'psf2otf': ('.utils', 'psf2otf'),
+    'otf2psf': ('.utils', 'otf2psf'),
+    'get_straight_skeleton': ('.skeleton', 'get_straight_skeleton'),
+    'collapse_short_edges': ('.skeleton', 'collapse_short_edges'),
+    'binarize': ('.batch', 'binarize'),
+    'skeletonize': ('skimage.morphology', 'skeletonize'),
+    'gaussian_laplace': ('.batch', 'gaussian_laplace'),
+    'fft2': ('scipy.fft', 'fft2'),
+    'fftshift': ('scipy.fft', 'fftshift'),
+}
+
+
+def binarize(im, threshold=None, invert=False):
+    """
+    Converts an image to a binary image using the given threshold (default is the mean of the
+    image). Pixels above the threshold are True unless invert is True.
+    """
+    bw = im > (im.mean() if threshold is None else threshold)
+    return ~bw if invert else bw
+
+
+def gaussian_laplace(im, sigma, **kwargs):
+    """
+    Computes the Laplacian of Gaussian of an image using scipy.ndimage.gaussian_laplace but always
+    with a floating-point output (the default precision). scipy keeps the dtype of the input, so
+    for uint8 images the negative values would wrap around and zerocross() would find nothing.
+    """
+    from scipy import ndimage
+    from .utils import resolve_dtype
+    return ndimage.gaussian_laplace(im, sigma, output=resolve_dtype(), **kwargs)
+
+
+def find_images(inputs):
+    """
+    Finds all of the images for the inputs, which can be a directory (searched recursively), a glob
+    pattern, or a list of paths. Returns the sorted list of image paths and the root directory that
+    the outputs are named relative to.
+    """
+    import glob
+    if isinstance(inputs, (str, os.PathLike)):
+        inputs = os.fspath(inputs)
+        if os.path.isdir(inputs):
+            paths = [os.path.join(dirpath, filename)
+                     for dirpath, _, filenames in os.walk(inputs) for filename in filenames
+                     if filename.lower().endswith(IMAGE_EXTENSIONS)]
+            return sorted(paths), inputs
+        paths = glob.glob(inputs, recursive=True)
+    else:
+        paths = [os.fspath(path) for path in inputs]
+    paths = sorted(path for path in paths if os.path.isfile(path))
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths]) if paths else '.'
+    return paths, root
+
+
+def __output_names(paths, root, output_dir):
+    """
+    Gets the output path (without an extension) for each input path, keeping the path relative to
+    the root. Raises a ValueError if two inputs would be written to the same output (such as
+    scan.png and scan.tif in the same directory).
+    """
+    outputs = [os.path.join(output_dir, os.path.splitext(os.path.relpath(path, root))[0])
+               for path in paths]
+    seen = {}
+    collisions = []
+    for path, output in zip(paths, outputs):
+        key = os.path.normcase(os.path.abspath(output))
+        if key in seen: collisions.append(f'{seen[key]} and {path}')
+        else: seen[key] = path
+    if collisions:
+        raise ValueError('inputs would overwrite each other\'s outputs: ' + '; '.join(collisions))
+    return outputs
+
+
+def __resolve(pipeline):
+    """Converts a pipeline into a list of (function, keyword arguments) pairs."""
+    from importlib import import_module
+    steps = []
+    for step in pipeline:
+        func, kwargs = (step, {}) if isinstance(step, str) or callable(step) else step
+        if isinstance(func, str):
+            if func not in STEPS: raise ValueError(f'unknown pipeline step "{func}"')
+            module, name = STEPS[func]
+            func = getattr(import_module(module, __package__), name)
+        steps.append((func, dict(kwargs)))
+    return steps
+
+
+def __decode(path, mode):
+    """Reads an image as a numpy array, converting it to the given PIL mode (if not None)."""
+    import PIL.Image
+    with PIL.Image.open(path) as im:
+        if mode is not None: im = im.convert(mode)
+        return np.asarray(im)
+
+
+def __write(result, output):
+    """
+    Writes a result to the output path (without an extension) as a PNG or .npz file. The file is
+    written to a temporary file first so an interrupted run never leaves a partial file.
+    """
+    import PIL.Image
+    result = np.asarray(result)
+    is_image = (result.ndim == 2 or (result.ndim == 3 and result.shape[2] in (3, 4))) and \
+        result.dtype in (np.bool_, np.uint8)
+    path = output + ('.png' if is_image else '.npz')
+    tmp = path + '.tmp'
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(tmp, 'wb') as f:
+        if is_image:
+            if result.dtype == np.bool_: result = result.view(np.uint8) * np.uint8(255)
+            PIL.Image.fromarray(result).save(f, format='png')
+        else:
+            np.savez_compressed(f, result=result)
+    os.replace(tmp, path)
+    return path
+
+
+def __process_chunk(pipeline, jobs, mode, prefetch):
+    """
+    Runs the pipeline on a chunk of (input, output) jobs in a worker process. The images are
+    decoded by a background thread up to prefetch images ahead. Returns a manifest entry for each
+    job.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    steps = __resolve(pipeline)
+    entries = []
+    with ThreadPoolExecutor(1) as decoder:
+        pending = [decoder.submit(__decode, path, mode) for path, _ in jobs[:prefetch+1]]
+        for i, (path, output) in enumerate(jobs):
+            if i + prefetch + 1 < len(jobs):
+                pending.append(decoder.submit(__decode, jobs[i+prefetch+1][0], mode))
+            start = perf_counter()
+            try:
+                result = pending[i].result()
+                pending[i] = None
+                for func, kwargs in steps: result = func(result, **kwargs)
+                entry = {'input': path, 'output': __write(result, output), 'status': 'ok'}
+            except Exception as ex:
+                entry = {'input': path, 'status': 'error', 'error': f'{type(ex).__name__}: {ex}'}
+            entry['time'] = perf_counter() - start
+            entries.append(entry)
+    return entries
+
+
+def __read_manifest(path):
+    """Reads the set of inputs (as absolute paths) that were successfully finished from a manifest."""
+    done = set()
+    if not os.path.exists(path): return done
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # a partial line from an interrupted run
+            if entry.get('status') == 'ok': done.add(os.path.abspath(entry['input']))
+    return done
+
+
+def run_batch(pipeline, inputs, output_dir, workers=None, chunk_size=16, max_in_flight=None,
+              prefetch=2, mode='L', manifest=None, resume=True, log=None):
+    """
+    Runs a pipeline on every image in inputs (a directory, glob pattern, or list of paths), saving
+    the results in output_dir with the same relative paths as the inputs. The images are converted
+    to the PIL mode given (default grayscale, None for no conversion) before the pipeline.
+
+    The work is done in chunks of chunk_size images by a pool of worker processes (default is the
+    number of CPUs) with at most max_in_flight chunks (default twice the number of workers)
+    submitted at once. Each worker decodes up to prefetch images ahead.
+
+    Each finished image is appended to the manifest (default manifest.jsonl in output_dir), keyed
+    by its absolute path. If resume is True, images that the manifest lists as successfully
+    finished are skipped. The log function (such as print) is called with a message for each image
+    that fails.
+
+    Raises a ValueError before any work is done if the pipeline has an unknown step or if two
+    inputs would have the same output name (e.g. scan.png and scan.tif in the same directory).
+
+    Returns a dictionary with the number of images that were processed ("ok"), that failed
+    ("error"), and that were skipped since they were already done ("skipped").
+    """
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    __resolve(pipeline)  # check the pipeline before starting any processes
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2*workers
+    manifest = manifest or os.path.join(output_dir, 'manifest.jsonl')
+
+    # Get all of the jobs that need to be done
+    paths, root = find_images(inputs)
+    paths = [os.path.abspath(path) for path in paths]  # so resuming works however inputs is spelled
+    outputs = __output_names(paths, root, output_dir)
+    done = __read_manifest(manifest) if resume else set()
+    jobs = [(path, output) for path, output in zip(paths, outputs) if path not in done]
+    chunks = (jobs[i:i+chunk_size] for i in range(0, len(jobs), chunk_size))
+    counts = {'ok': 0, 'error': 0, 'skipped': len(paths) - len(jobs)}
+    os.makedirs(os.path.dirname(os.path.abspath(manifest)), exist_ok=True)
+
+    # Run the chunks, keeping a bounded number in flight
+    with open(manifest, 'a' if resume else 'w') as f, ProcessPoolExecutor(workers) as pool:
+        in_flight = set()
+        try:
+            for chunk in chunks:
+                if len(in_flight) >= max_in_flight:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    __record(finished, f, counts, log)
+                in_flight.add(pool.submit(__process_chunk, pipeline, chunk, mode, prefetch))
+            __record(wait(in_flight)[0], f, counts, log)
+        except BaseException:
+            for future in in_flight: future.cancel()
+            raise
+    return counts
+
+
+def __record(futures, f, counts, log):
+    """Adds the entries from finished chunks to the manifest and the counts."""
+    for future in futures:
+        for entry in future.result():
+            counts[entry['status']] += 1
+            if log and entry['status'] == 'error': log(f"{entry['input']}: {entry['error']}")
+            f.write(json.dumps(entry) + '\n')
+    f.flush()
+
+
+def __parse_step(text):
+    """Parses a command line step like "homomorphic_filter:cutoff=10,order=3"."""
+    from ast import literal_eval
+    name, _, args = text.partition(':')
+    kwargs = {}
+    for arg in filter(None, args.split(',')):
+        key, _, value = arg.partition('=')
+        try:
+            kwargs[key.strip()] = literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            kwargs[key.strip()] = value.strip()  # plain strings do not need quotes
+    return name.strip(), kwargs
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog='python -m ImageProcessingF2021.batch',
+        description='Runs a pipeline of functions on a directory or glob of images. Steps are '
+                    'given in order as NAME or NAME:KEY=VALUE,KEY=VALUE. Known steps: ' +
+                    ', '.join(STEPS))
+    parser.add_argument('inputs', help='directory or glob pattern of images')
+    parser.add_argument('output_dir', help='directory to save the results in')
+    parser.add_argument('-s', '--step', action='append', required=True, type=__parse_step,
+                        dest='pipeline', help='a step of the pipeline (can be given many times)')
+    parser.add_argument('-w', '--workers', type=int, help='number of processes (default #CPUs)')
+    parser.add_argument('-c', '--chunk-size', type=int, default=16,
+                        help='images per task (default 16)')
+    parser.add_argument('--max-in-flight', type=int, help='tasks submitted at once (default 2x workers)')
+    parser.add_argument('--prefetch', type=int, default=2, help='images decoded ahead (default 2)')
+    parser.add_argument('--mode', default='L', help='PIL mode to convert images to, or "none" (default L)')
+    parser.add_argument('--manifest', help='manifest file (default OUTPUT_DIR/manifest.jsonl)')
+    parser.add_argument('--no-resume', dest='resume', action='store_false',
+                        help='redo all images instead of skipping the ones in the manifest')
+    args = parser.parse_args(argv)
+    try:
+        counts = run_batch(args.pipeline, args.inputs, args.output_dir, args.workers,
+                           args.chunk_size, args.max_in_flight, args.prefetch,
+                           None if args.mode.lower() == 'none' else args.mode,
+                           args.manifest, args.resume, print)
+    except ValueError as ex:  # an unknown step or colliding outputs, found before any work
+        parser.error(str(ex))
+    print(f"{counts['ok']} processed, {counts['error']} failed, {counts['skipped']} already done")
+    return 1 if counts['error'] else 0
+
+
+if __name__ == '__main__':
+    # Run main() from the package module (not __main__) so the worker processes can find it
+    import sys
+    from importlib import import_module
+    sys.exit(import_module('.batch', __package__).main())
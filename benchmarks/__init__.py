@@ -0,0 +1,261 @@
+"""
+Benchmarks for the public functions of this package using the images in the images/ directory.
+
+Each benchmark is run on its image at the native size and on upscaled versions of the image with
+the given numbers of megapixels. The minimum time over several repeats and the peak memory
+allocated during a single run (using tracemalloc) are recorded. The results can be saved as a
+baseline and later runs compared against the baseline to find regressions.
+
+Run from the command line with:
+    python -m ImageProcessingF2021.benchmarks --help
+"""
+
+import os
+import gc
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+
+__all__ = ["IMAGES_DIR", "DEFAULT_SIZES", "FULL_SIZES", "load_image", "upscale", "load_puzzles",
+           "BENCHMARKS", "run_benchmarks", "compare", "load_results", "save_results"]
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'images')
+PUZZLES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'puzzles.txt')
+
+# Megapixels of the upscaled images: a quick default and the full range from 1 to 100 megapixels
+DEFAULT_SIZES = (1, 4, 16)
+FULL_SIZES = (1, 4, 16, 64, 100)
+
+
+##### Inputs #####
+def load_image(name):
+    """Loads an image from the images directory as a 2D grayscale uint8 array."""
+    import PIL.Image
+    with PIL.Image.open(os.path.join(IMAGES_DIR, name)) as im:
+        return np.asarray(im.convert('L'))
+
+
+def upscale(im, megapixels):
+    """Resizes an image (with bilinear interpolation) to about the given number of megapixels."""
+    import PIL.Image
+    h, w = im.shape
+    scale = (megapixels * 1e6 / (h * w)) ** 0.5
+    size = max(round(w * scale), 1), max(round(h * scale), 1)
+    return np.asarray(PIL.Image.fromarray(im).resize(size, PIL.Image.BILINEAR))
+
+
+def load_puzzles(path=PUZZLES_FILE):
+    """Loads the Sudoku puzzles as a list of 9x9 arrays (one puzzle per line, 0 for blank cells)."""
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+    return [np.array([int(c) for c in line]).reshape(9, 9)
+            for line in lines if line and not line.startswith('#')]
+
+
+def __binary(im):
+    """Converts a grayscale image to a binary image with the foreground as the minority."""
+    bw = im > im.mean()
+    return ~bw if bw.mean() > 0.5 else bw
+
+
+##### Benchmarks #####
+# Each benchmark setup function takes a grayscale image and returns a function with no arguments
+# to time. All preparation of the inputs is done in the setup function so it is not timed.
+def __fourier_filter(name, *args):
+    def setup(im):
+        from .. import fourier_filters
+        func = getattr(fourier_filters, name)
+        return lambda: func(*im.shape, *args)
+    return setup
+
+
+def __filter_apply(im):
+    from ..fourier_filters import FourierFilter
+    fltr = FourierFilter.butterworth_high_pass(30, 2) * FourierFilter.gaussian(80)
+    spectrum = np.fft.fftshift(np.fft.fft2(im))
+    buf = np.empty_like(spectrum)
+    def run():
+        # refill the buffer so every run filters the same data (the copy is included in the time)
+        np.copyto(buf, spectrum)
+        fltr.apply(buf, inplace=True)
+    return run
+
+
+def __homomorphic_filter(im):
+    from .. import homomorphic_filter
+    return lambda: homomorphic_filter(im, 10)
+
+
+def __fftshow(mode):
+    def setup(im):
+        from .. import fftshow
+        if mode == 'color': import matplotlib  # fail during setup if not available
+        spectrum = np.fft.fftshift(np.fft.fft2(im))
+        return lambda: fftshow(spectrum, mode, plot=False)
+    return setup
+
+
+def __zerocross(im):
+    from scipy.ndimage import gaussian_laplace
+    from .. import zerocross
+    log = gaussian_laplace(im.astype(float), 2)
+    return lambda: zerocross(log)
+
+
+def __psf2otf(im):
+    from .. import gaussian, psf2otf
+    psf = gaussian(15, 15, 3, normed=True)
+    return lambda: psf2otf(psf, im.shape)
+
+
+def __otf2psf(im):
+    from .. import gaussian, psf2otf, otf2psf
+    otf = psf2otf(gaussian(15, 15, 3, normed=True), im.shape)
+    return lambda: otf2psf(otf, (15, 15))
+
+
+def __skeleton(im):
+    from skimage.morphology import skeletonize
+    return skeletonize(__binary(im))
+
+
+def __get_straight_skeleton(im):
+    from ..skeleton import get_straight_skeleton
+    skeleton = __skeleton(im)
+    return lambda: get_straight_skeleton(skeleton)
+
+
+def __collapse_short_edges(im):
+    from ..skeleton import get_straight_skeleton, collapse_short_edges
+    lines = get_straight_skeleton(__skeleton(im))
+    return lambda: collapse_short_edges(lines, 5)
+
+
+def __sudoku(_):
+    from ..sudoku import solve
+    puzzles = load_puzzles()
+    return lambda: [solve(puzzle.copy()) for puzzle in puzzles]
+
+
+# Name -> (setup function, default image, whether it is run on upscaled images)
+BENCHMARKS = {
+    'ideal_low_pass': (__fourier_filter('ideal_low_pass', 30), 'cameraman.tif', True),
+    'ideal_high_pass': (__fourier_filter('ideal_high_pass', 30), 'cameraman.tif', True),
+    'butterworth_low_pass': (__fourier_filter('butterworth_low_pass', 30, 2), 'cameraman.tif', True),
+    'butterworth_high_pass': (__fourier_filter('butterworth_high_pass', 30, 2), 'cameraman.tif', True),
+    'gaussian': (__fourier_filter('gaussian', 30), 'cameraman.tif', True),
+    'gaussian_low_pass': (__fourier_filter('gaussian_low_pass', 30), 'cameraman.tif', True),
+    'gaussian_high_pass': (__fourier_filter('gaussian_high_pass', 30), 'cameraman.tif', True),
+    'FourierFilter.apply': (__filter_apply, 'cameraman.tif', True),
+    'homomorphic_filter': (__homomorphic_filter, 'xray.png', True),
+    'fftshow.mag': (__fftshow('mag'), 'cameraman.tif', True),
+    'fftshow.color': (__fftshow('color'), 'cameraman.tif', True),
+    'zerocross': (__zerocross, 'blood.png', True),
+    'psf2otf': (__psf2otf, 'cameraman.tif', True),
+    'otf2psf': (__otf2psf, 'cameraman.tif', True),
+    'get_straight_skeleton': (__get_straight_skeleton, 'morph_text.png', True),
+    'collapse_short_edges': (__collapse_short_edges, 'morph_text.png', True),
+    'sudoku.solve': (__sudoku, None, False),
+}
+
+
+##### Running #####
+def __variants(name, image_name, im, sizes):
+    """Generates the native and upscaled images, one at a time to limit memory use."""
+    yield f'{name}[{image_name}@native]', im
+    for mp in sizes:
+        yield f'{name}[{image_name}@{mp}MP]', upscale(im, mp)
+
+
+def __measure(func, repeat):
+    """Gets the minimum time over repeat runs and the peak memory of one more run of a function."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+    gc.collect()
+    started = not tracemalloc.is_tracing()
+    if started: tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if started: tracemalloc.stop()
+    return min(times), peak
+
+
+def run_benchmarks(names=None, sizes=DEFAULT_SIZES, image=None, repeat=3, log=None):
+    """
+    Runs the benchmarks with the given names (default all) on the native images and upscaled
+    versions of the images with each of the given numbers of megapixels (FULL_SIZES covers 1 to
+    100 megapixels). If image is given it is used instead of the default image of each benchmark.
+    Benchmarks whose optional dependencies are not available are skipped. The log function (such
+    as print) is called with the result of each benchmark as it finishes.
+
+    Returns a dictionary of results with keys like "zerocross[blood.png@4MP]" and values that are
+    dictionaries with the time (in seconds), the peak memory (in bytes), and the shape.
+    """
+    results = {}
+    images = {}
+    for name in (names or BENCHMARKS):
+        setup, default_image, scalable = BENCHMARKS[name]
+        image_name = image or default_image
+        if image_name is None:
+            variants = [(name, None)]
+        else:
+            if image_name not in images: images[image_name] = load_image(image_name)
+            variants = __variants(name, image_name, images[image_name], sizes if scalable else ())
+        for key, im in variants:
+            try:
+                func = setup(im)
+            except ImportError as ex:
+                if log: log(f'{key}: skipped ({ex})')
+                break
+            time, peak = __measure(func, repeat)
+            results[key] = {'time': time, 'peak_bytes': peak,
+                            'shape': None if im is None else list(im.shape)}
+            del func
+            if log: log(f'{key}: {time*1000:.2f} ms, {peak/2**20:.1f} MiB')
+    return results
+
+
+def compare(results, baseline, time_tolerance=0.25, memory_tolerance=0.1):
+    """
+    Compares results to baseline results, returning a list of messages describing each regression.
+    A result has regressed if its time is more than time_tolerance (as a fraction) slower than the
+    baseline or its peak memory is more than memory_tolerance (plus 64 KiB, so tiny allocations do
+    not cause failures) larger than the baseline. Results that are not in the baseline are ignored.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None: continue
+        if result['time'] > base['time'] * (1 + time_tolerance):
+            regressions.append(f"{key}: time {result['time']*1000:.2f} ms vs baseline "
+                               f"{base['time']*1000:.2f} ms")
+        if result['peak_bytes'] > base['peak_bytes'] * (1 + memory_tolerance) + 2**16:
+            regressions.append(f"{key}: peak memory {result['peak_bytes']} bytes vs baseline "
+                               f"{base['peak_bytes']} bytes")
+    return regressions
+
+
+def load_results(path):
+    """Loads results saved with save_results()."""
+    import json
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def save_results(results, path):
+    """Saves results along with information about the environment they were run in."""
+    import json, platform
+    import scipy
+    info = {'python': platform.python_version(), 'platform': platform.platform(),
+            'processor': platform.processor(), 'numpy': np.__version__, 'scipy': scipy.__version__}
+    with open(path, 'w') as f:
+        json.dump({'environment': info, 'results': results}, f, indent=2)
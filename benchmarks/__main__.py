@@ -0,0 +1,58 @@
+"""
+Command line interface for the benchmarks. Runs the benchmarks, optionally saving the results and
+comparing them to a baseline. Exits with status 1 if any result regressed past the baseline.
+"""
+
+import sys
+import argparse
+
+from . import BENCHMARKS, DEFAULT_SIZES, FULL_SIZES, run_benchmarks, compare, load_results, save_results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ImageProcessingF2021.benchmarks',
+                                     description=__doc__)
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help='benchmarks to run (default all): ' + ', '.join(BENCHMARKS))
+    sizes = parser.add_mutually_exclusive_group()
+    sizes.add_argument('-s', '--sizes', type=float, nargs='*', default=list(DEFAULT_SIZES),
+                       help='megapixels of the upscaled images (default %s)' %
+                       ' '.join(map(str, DEFAULT_SIZES)))
+    sizes.add_argument('--full', dest='sizes', action='store_const', const=list(FULL_SIZES),
+                       help='use the full range of upscaled images (%s megapixels)' %
+                       ' '.join(map(str, FULL_SIZES)))
+    parser.add_argument('-i', '--image', help='image in images/ to use for all benchmarks')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='number of timed runs (default 3)')
+    parser.add_argument('-o', '--output', help='save the results to this JSON file')
+    parser.add_argument('-b', '--baseline', help='compare the results to this baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='save the results as the baseline instead of comparing them')
+    parser.add_argument('--time-tolerance', type=float, default=0.25,
+                        help='allowed fraction of slowdown from the baseline (default 0.25)')
+    parser.add_argument('--memory-tolerance', type=float, default=0.1,
+                        help='allowed fraction of peak memory increase from the baseline (default 0.1)')
+    args = parser.parse_args(argv)
+    if args.save_baseline and not args.baseline:
+        parser.error('--save-baseline requires --baseline')
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown: parser.error('unknown benchmark(s): ' + ', '.join(unknown))
+
+    sizes = [int(mp) if mp == int(mp) else mp for mp in args.sizes]
+    results = run_benchmarks(args.names or None, sizes, args.image, args.repeat, print)
+    if args.output: save_results(results, args.output)
+    if args.baseline:
+        if args.save_baseline:
+            save_results(results, args.baseline)
+            return 0
+        regressions = compare(results, load_results(args.baseline),
+                              args.time_tolerance, args.memory_tolerance)
+        if regressions:
+            print(f'{len(regressions)} regression(s) past the baseline:')
+            for regression in regressions: print('  ' + regression)
+            return 1
+        print('No regressions past the baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,8 @@
 import numpy as np
+from .profiling import profiled
 
-def fftshow(arr, mode='mag', log_scale=True, eliminate_dc=True, plot=True):
+@profiled()
+def fftshow(arr, mode='mag', log_scale=True, eliminate_dc=True, plot=True, dtype=None):
     """
     Shows a 2D Fourier transform using one of the following modes:
       * "mag" - the complex magnitude (default)
@@ -16,8 +18,13 @@ def fftshow(arr, mode='mag', log_scale=True, eliminate_dc=True, plot=True):
     `log_scale` and `eliminate_dc` to False to turn these off.
     
     Instead of plotting the image the generated image can be returned so that
-    it can be saved or otherwise manipulated.
+    it can be saved or otherwise manipulated. The generated image has the given
+    floating-point dtype (default precision if not given).
     """
+    from .utils import as_float, resolve_dtype
+    dtype = resolve_dtype(dtype)
+    arr = as_float(arr, dtype)
+
     # Calculate the complex magnitude
     mag = abs(arr)
     
@@ -42,7 +49,7 @@ def fftshow(arr, mode='mag', log_scale=True, eliminate_dc=True, plot=True):
         H[dc_i, dc_j] = 0 # correct DC component angle
         
         # The saturation is all 1s (except DC)
-        S = np.ones(arr.shape)
+        S = np.ones(arr.shape, dtype)
         S[dc_i, dc_j] = 0
         
         # The values are the normalized magnitude of the complex number (from 0 to 1)
@@ -50,7 +57,7 @@ def fftshow(arr, mode='mag', log_scale=True, eliminate_dc=True, plot=True):
 
         # Convert HSV to RGB for displaying
         from matplotlib.colors import hsv_to_rgb
-        im = hsv_to_rgb(np.dstack((H, S, V)))
+        im = hsv_to_rgb(np.dstack((H, S, V))).astype(dtype, copy=False)
     
     # Unknown mode
     else: raise ValueError('mode must be one of "mag" or "color"')
@@ -1,65 +1,305 @@
-"""Functions to create Fourier-space filters."""
+"""
+Functions to create Fourier-space filters.
 
-def __x2y2(w, h):
-    """Creates the mesh grid of x^2 + y^2 from -w/2 to w/2 and -h/2 to h/2"""
-    # Actually uses ogrid (open-grid) instead of meshgrid() since it is more efficient and less code
-    from numpy import ogrid
-    x,y = ogrid[-(w//2):((w+1)//2), -(h//2):((h+1)//2)]
-    return y*y + x*x
+All filters are computed in the given dtype, or the package-wide default (see
+utils.set_default_dtype) if not given, so float32 filters never go through a float64 temporary.
 
+Besides the functions that directly create filter arrays, filters can be built lazily with the
+FourierFilter class and combined with *, +, -, and scalars. For example:
 
-def ideal_low_pass(w, h, D):
+    fltr = FourierFilter.butterworth_high_pass(30, 2) * FourierFilter.gaussian(80)
+    fltr.apply(spectrum, inplace=True)  # or fltr.evaluate(w, h) to get the filter array
+
+A combined filter is only evaluated once, a block of rows at a time, sharing the x and y grids
+between all of its terms so that no full-size intermediate arrays are created.
+"""
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from .utils import resolve_dtype
+from .profiling import profiled, phase
+
+__all__ = ["FourierFilter",
+           "ideal_low_pass", "ideal_high_pass",
+           "butterworth_low_pass", "butterworth_high_pass",
+           "gaussian", "gaussian_low_pass", "gaussian_high_pass"]
+
+
+class FourierFilter(ABC):
+    """
+    A lazily-evaluated Fourier-space filter. These are created with the static methods (e.g.
+    FourierFilter.gaussian(sigma)) and can be combined with other filters and scalars using *, +,
+    -, and / (by a scalar only). Nothing is computed until evaluate() or apply() is called.
+
+    Like the other functions in this module, the filters are centered in the array so they are
+    meant for spectra that have been fftshift()-ed.
+    """
+    # Number of elements to evaluate at a time, small enough that the scratch buffers stay in cache
+    block_size = 1 << 16
+
+    # Make numpy defer to our operators instead of creating object arrays (e.g. for ndarray * fltr)
+    __array_ufunc__ = None
+
+    ##### Basic filters #####
+    @staticmethod
+    def ideal_low_pass(D, center=(0, 0)):
+        """An ideal low-pass filter with the cutoff D."""
+        return _Radial('ideal_low_pass', (float(D*D),), center)
+
+    @staticmethod
+    def ideal_high_pass(D, center=(0, 0)):
+        """An ideal high-pass filter with the cutoff D."""
+        return _Radial('ideal_high_pass', (float(D*D),), center)
+
+    @staticmethod
+    def butterworth_low_pass(D, n, center=(0, 0)):
+        """A Butterworth low-pass filter with the cutoff D and order n."""
+        return _Radial('butterworth_low_pass', (float(D*D), n), center)
+
+    @staticmethod
+    def butterworth_high_pass(D, n, center=(0, 0)):
+        """
+        A Butterworth high-pass filter with the cutoff D and order n. Products of these with
+        different centers make notch filters.
+        """
+        return _Radial('butterworth_high_pass', (float(D*D), n), center)
+
+    @staticmethod
+    def gaussian(sigma, center=(0, 0)):
+        """A Gaussian with the standard deviation sigma and a peak of 1."""
+        return _Radial('gaussian', (float(sigma*sigma),), center)
+
+    gaussian_low_pass = gaussian
+
+    @staticmethod
+    def gaussian_high_pass(sigma, center=(0, 0)):
+        """A Gaussian high-pass filter with the standard deviation sigma."""
+        return 1 - FourierFilter.gaussian(sigma, center)
+
+    ##### Evaluation #####
+    def evaluate(self, w, h, dtype=None, spacing=1):
+        """
+        Creates the w x h filter array using the given dtype (default precision if not given). The
+        spacing is the distance between neighboring samples, in the units of the filter's cutoffs
+        (by default 1 so the cutoffs are in samples).
+        """
+        dtype = resolve_dtype(dtype)
+        out = np.empty((w, h), dtype)
+        with phase('fourier_filters.FourierFilter.evaluate', out):
+            x, y = _grid(w, h, dtype)
+            if spacing != 1: x, y = x * float(spacing), y * float(spacing)
+            buffers = []
+            for start, stop in self.__blocks(w, h):
+                self._eval(x[start:stop], y, out[start:stop], buffers, 0)
+        return out
+
+    def apply(self, spectrum, inplace=False):
+        """
+        Multiplies a centered spectrum by this filter. The filter is computed a block of rows at a
+        time in the real precision of the spectrum so the full filter array is never created. If
+        inplace is True the spectrum is modified and returned, otherwise a new array is returned.
+        Any leading dimensions of the spectrum (for a stack of spectra) share the same filter.
+        """
+        spectrum = np.asarray(spectrum)
+        dtype = resolve_dtype(spectrum.dtype if spectrum.dtype.kind in 'fc' else None)
+        if not inplace: spectrum = spectrum.astype(np.result_type(spectrum, dtype))
+        w, h = spectrum.shape[-2:]
+        with phase('fourier_filters.FourierFilter.apply', spectrum):
+            x, y = _grid(w, h, dtype)
+            buffers = []
+            out = np.empty((min(w, max(self.block_size // max(h, 1), 1)), h), dtype)
+            for start, stop in self.__blocks(w, h):
+                fltr = out[:stop-start]
+                self._eval(x[start:stop], y, fltr, buffers, 0)
+                spectrum[..., start:stop, :] *= fltr
+        return spectrum
+
+    def __blocks(self, w, h):
+        """Generates the (start, stop) rows of each block to evaluate."""
+        step = max(self.block_size // max(h, 1), 1)
+        for start in range(0, w, step):
+            yield start, min(start + step, w)
+
+    @abstractmethod
+    def _eval(self, x, y, out, buffers, level):
+        """
+        Evaluates the filter into out given the open grids x (a column) and y (a row). The list of
+        buffers holds scratch arrays for each nesting level, starting with level.
+        """
+
+    ##### Operators #####
+    def __mul__(self, other):
+        if isinstance(other, FourierFilter): return _Product(self, other)
+        return _Affine(self, _scalar(other), 0.0)
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, FourierFilter): return NotImplemented
+        return _Affine(self, 1/_scalar(other), 0.0)
+
+    def __add__(self, other):
+        if isinstance(other, FourierFilter): return _Sum(self, other)
+        return _Affine(self, 1.0, _scalar(other))
+    __radd__ = __add__
+
+    def __neg__(self): return _Affine(self, -1.0, 0.0)
+
+    def __sub__(self, other): return self + (-other)
+
+    def __rsub__(self, other): return _Affine(self, -1.0, _scalar(other))
+
+
+def _scalar(value):
+    """Converts a value that a filter is combined with to a float, only allowing scalars."""
+    if np.ndim(value) != 0:
+        raise TypeError('filters can only be combined with other filters and scalars')
+    return float(value)
+
+
+def _grid(w, h, dtype):
+    """Creates the open grids x (a column) and y (a row) from -w/2 to w/2 and -h/2 to h/2"""
+    x, y = np.ogrid[-(w//2):((w+1)//2), -(h//2):((h+1)//2)]
+    return x.astype(dtype), y.astype(dtype)  # the open grids are tiny so casting them is cheap
+
+
+def _scratch(buffers, level, like):
+    """Gets the scratch buffer for a nesting level, (re)allocating it if it is too small."""
+    while len(buffers) <= level: buffers.append(None)
+    buf = buffers[level]
+    if buf is None or buf.size < like.size or buf.dtype != like.dtype:
+        buf = buffers[level] = np.empty(like.size, like.dtype)
+    return buf[:like.size].reshape(like.shape)
+
+
+class _Radial(FourierFilter):
+    """One of the basic filters, a function of the squared distance from the center."""
+    def __init__(self, kind, params, center):
+        self.kind, self.params, self.center = kind, params, (float(center[0]), float(center[1]))
+
+    def __repr__(self):
+        return f'{self.kind}{self.params}' + (f'@{self.center}' if any(self.center) else '')
+
+    def _eval(self, x, y, out, buffers, level):
+        # Squared distance from the center, computed on the small open grids
+        if self.center[0]: x = x - self.center[0]
+        if self.center[1]: y = y - self.center[1]
+        np.add(x*x, y*y, out=out)
+
+        # Apply the filter function in-place
+        kind, p = self.kind, self.params
+        if kind == 'ideal_low_pass': np.less_equal(out, p[0], out=out)
+        elif kind == 'ideal_high_pass': np.greater(out, p[0], out=out)
+        elif kind == 'gaussian':
+            out *= -1/p[0]
+            np.exp(out, out=out)
+        else:  # Butterworth
+            out *= 1/p[0]
+            out **= p[1]
+            out += 1
+            np.reciprocal(out, out=out)
+            if kind == 'butterworth_high_pass':
+                out -= 1; out *= -1  # 1 - out
+
+
+class _Affine(FourierFilter):
+    """A filter that is scaled and offset: scale * fltr + offset."""
+    def __init__(self, fltr, scale, offset):
+        if isinstance(fltr, _Affine):  # fold nested scalings together
+            scale, offset = scale * fltr.scale, scale * fltr.offset + offset
+            fltr = fltr.fltr
+        self.fltr, self.scale, self.offset = fltr, scale, offset
+
+    def __repr__(self): return f'({self.scale} * {self.fltr!r} + {self.offset})'
+
+    def _eval(self, x, y, out, buffers, level):
+        self.fltr._eval(x, y, out, buffers, level)
+        if self.scale != 1: out *= self.scale
+        if self.offset != 0: out += self.offset
+
+
+class _Product(FourierFilter):
+    """The product of several filters."""
+    op, symbol = staticmethod(np.multiply), '*'
+
+    def __init__(self, *fltrs):
+        self.fltrs = [f for fltr in fltrs
+                      for f in (fltr.fltrs if type(fltr) is type(self) else (fltr,))]
+
+    def __repr__(self): return '(' + f' {self.symbol} '.join(map(repr, self.fltrs)) + ')'
+
+    def _eval(self, x, y, out, buffers, level):
+        self.fltrs[0]._eval(x, y, out, buffers, level)
+        buf = _scratch(buffers, level, out)
+        for fltr in self.fltrs[1:]:
+            fltr._eval(x, y, buf, buffers, level+1)
+            self.op(out, buf, out=out)
+
+
+class _Sum(_Product):
+    """The sum of several filters."""
+    op, symbol = staticmethod(np.add), '+'
+
+
+@profiled()
+def ideal_low_pass(w, h, D, dtype=None):
     """
     Creates a Fourier-space ideal low-pass filter of the given width and height with the cutoff D.
     """
-    return (__x2y2(w,h)<=(D*D)).astype(float)
+    return FourierFilter.ideal_low_pass(D).evaluate(w, h, dtype)
 
 
-def ideal_high_pass(w, h, D):
+@profiled()
+def ideal_high_pass(w, h, D, dtype=None):
     """
     Creates a Fourier-space ideal high-pass filter of the given width and height with the cutoff D.
     """
-    return (__x2y2(w,h)>(D*D)).astype(float)
+    return FourierFilter.ideal_high_pass(D).evaluate(w, h, dtype)
 
 
-def butterworth_low_pass(w, h, D, n):
+@profiled()
+def butterworth_low_pass(w, h, D, n, dtype=None):
     """
     Creates a Fourier-space Butterworth low-pass filter of the given width and height with the
     cutoff D and order n.
     """
-    return 1 / (1 + (__x2y2(w,h)/(D*D))**n)
+    return FourierFilter.butterworth_low_pass(D, n).evaluate(w, h, dtype)
 
 
-def butterworth_high_pass(w, h, D, n):
+@profiled()
+def butterworth_high_pass(w, h, D, n, dtype=None):
     """
     Creates a Fourier-space Butterworth high-pass filter of the given width and height with the
     cutoff D and order n.
     """
-    return 1 - butterworth_low_pass(w, h, D, n)
+    return FourierFilter.butterworth_high_pass(D, n).evaluate(w, h, dtype)
 
 
-def gaussian(w, h, sigma, normed=False):
+@profiled()
+def gaussian(w, h, sigma, normed=False, dtype=None):
     """
     Creates a Gaussian centered in a w x h image with the given standard deviation sigma. By
     default this has a peak of 1. If normed is True then this is normalized so it sums to 1.
     """
-    from numpy import exp
-    g = exp(-__x2y2(w,h)/(sigma*sigma))
+    g = FourierFilter.gaussian(sigma).evaluate(w, h, dtype)
     if normed: g /= g.sum()
     return g
 
 
-def gaussian_low_pass(w, h, sigma):
+@profiled()
+def gaussian_low_pass(w, h, sigma, dtype=None):
     """
     Creates a Gaussian low-pass filter centered in a w x h image with the given standard deviation
     sigma.
     """
-    return gaussian(w, h, sigma)
+    return gaussian(w, h, sigma, dtype=dtype)
 
 
-def gaussian_high_pass(w, h, sigma):
+@profiled()
+def gaussian_high_pass(w, h, sigma, dtype=None):
     """
     Creates a Gaussian high-pass filter centered in a w x h image with the given standard deviation
     sigma.
     """
-    return 1 - gaussian(w, h, sigma)
+    return FourierFilter.gaussian_high_pass(sigma).evaluate(w, h, dtype)
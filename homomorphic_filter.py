@@ -1,20 +1,31 @@
-def homomorphic_filter(im, cutoff, order=2, lowgain=0.5, highgain=2):
+from .profiling import profiled, phase
+
+
+@profiled()
+def homomorphic_filter(im, cutoff, order=2, lowgain=0.5, highgain=2, dtype=None):
     """
     Applies a homomorphic filter to an image using a Butterworth filter as the
-    low-pass filter base for the high-boost filter.
+    low-pass filter base for the high-boost filter. The computations are done
+    in the given floating-point dtype (default precision if not given).
     """
     from numpy import log, ogrid, exp
     from scipy import fft
-    im = im.astype(float)
+    from .utils import resolve_dtype
+    dtype = resolve_dtype(dtype)
+    im = im.astype(dtype)
     im[im==0] = 1 # prevent taking the log of 0
-    lg = log(im)
-    ft = fft.fftshift(fft.fft2(lg))
+    lg = log(im, out=im)
+    with phase('homomorphic_filter.fft', lg):
+        ft = fft.fftshift(fft.fft2(lg))
     h,w = im.shape
-    y,x = ogrid[-(h//2):(h+1)//2, -(w//2):(w+1)//2]  # similar to meshgrid()
-    bw_fltr = 1/(1+0.414*((x*x+y*y)/(cutoff*cutoff))**order)
-    fltr = lowgain + (highgain - lowgain) * (1 - bw_fltr)
+    with phase('homomorphic_filter.mask'):
+        y,x = ogrid[-(h//2):(h+1)//2, -(w//2):(w+1)//2]  # similar to meshgrid()
+        y,x = y.astype(dtype), x.astype(dtype)
+        bw_fltr = 1/(1+0.414*((x*x+y*y)/float(cutoff*cutoff))**float(order))
+        fltr = float(lowgain) + float(highgain - lowgain) * (1 - bw_fltr)
     fltred = fltr * ft
-    out = exp(fft.ifft2(fft.ifftshift(fltred)).real)
+    with phase('homomorphic_filter.ifft', fltred):
+        out = exp(fft.ifft2(fft.ifftshift(fltred)).real)
     # rescale the intensities
     out -= out.min()
     out *= 255/out.max()
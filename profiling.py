@@ -0,0 +1,193 @@
+"""
+Opt-in profiling of the functions in this package.
+
+Profiling is disabled by default and costs a single flag check per call while disabled. Once
+enabled with enable(), every public function records its number of calls, wall and CPU time, the
+shapes of its array arguments, and (if memory tracking is on) the peak number of temporary bytes
+allocated. Internal phases such as FFTs, mask building, and the Sudoku strategy methods are
+recorded the same way. The results can be retrieved with stats() or exported with save_json() or
+save_chrome_trace() (viewable in chrome://tracing or Perfetto).
+
+Example:
+    from ImageProcessingF2021 import profiling
+    profiling.enable()
+    ...
+    profiling.save_chrome_trace('trace.json')
+"""
+
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter, process_time
+
+__all__ = ["enable", "disable", "is_enabled", "reset", "profiled", "phase",
+           "stats", "save_json", "save_chrome_trace"]
+
+__enabled = False
+__track_memory = False
+__started_tracemalloc = False  # only stop tracemalloc if we started it
+__lock = threading.Lock()
+__stats = {}  # name -> dict of accumulated values
+__events = []  # Chrome trace "complete" events
+__local = threading.local()  # per-thread stack of active records (for nested peak memory)
+__start = perf_counter()
+
+
+def enable(memory=True):
+    """
+    Enables profiling. If memory is True then the peak temporary bytes of each call are tracked
+    using tracemalloc, which slows down allocation-heavy code somewhat.
+    """
+    global __enabled, __track_memory, __started_tracemalloc
+    __track_memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        __started_tracemalloc = True
+    __enabled = True
+
+
+def disable():
+    """Disables profiling. The results recorded so far are kept until reset() is called."""
+    global __enabled, __started_tracemalloc
+    __enabled = False
+    if __started_tracemalloc:
+        tracemalloc.stop()
+        __started_tracemalloc = False
+
+
+def is_enabled():
+    """Checks if profiling is currently enabled."""
+    return __enabled
+
+
+def reset():
+    """Removes all of the recorded results."""
+    global __start
+    with __lock:
+        __stats.clear()
+        __events.clear()
+        __start = perf_counter()
+
+
+def __shapes(args, kwargs):
+    """Gets the shapes of all of the array-like arguments as a tuple of tuples."""
+    return tuple(tuple(arg.shape) for arg in (*args, *kwargs.values())
+                 if hasattr(arg, 'shape') and hasattr(arg, 'dtype'))
+
+
+def __begin():
+    """Starts a record, returning the state needed to finish it."""
+    stack = getattr(__local, 'stack', None)
+    if stack is None: stack = __local.stack = []
+    mem = None
+    if __track_memory and tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        if stack: stack[-1][0] = max(stack[-1][0], peak)  # remember the parent's peak so far
+        tracemalloc.reset_peak()
+        mem = current
+    record = [0, mem]  # [peak seen by children, memory at start]
+    stack.append(record)
+    return record, perf_counter(), process_time()
+
+
+def __end(name, shapes, record, wall_start, cpu_start):
+    """Finishes a record and adds it to the results."""
+    wall_end, cpu_end = perf_counter(), process_time()
+    stack = __local.stack
+    stack.pop()
+    peak_bytes = None
+    if record[1] is not None and tracemalloc.is_tracing():
+        peak = max(record[0], tracemalloc.get_traced_memory()[1])
+        peak_bytes = max(peak - record[1], 0)
+        if stack: stack[-1][0] = max(stack[-1][0], peak)
+    with __lock:
+        s = __stats.get(name)
+        if s is None:
+            s = __stats[name] = {'calls': 0, 'wall_time': 0.0, 'cpu_time': 0.0,
+                                 'max_wall_time': 0.0, 'peak_bytes': 0, 'shapes': {}}
+        wall = wall_end - wall_start
+        s['calls'] += 1
+        s['wall_time'] += wall
+        s['cpu_time'] += cpu_end - cpu_start
+        s['max_wall_time'] = max(s['max_wall_time'], wall)
+        if peak_bytes is not None: s['peak_bytes'] = max(s['peak_bytes'], peak_bytes)
+        if shapes:
+            key = ' '.join('x'.join(map(str, shape)) for shape in shapes)
+            s['shapes'][key] = s['shapes'].get(key, 0) + 1
+        event = {'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_ident(),
+                 'ts': (wall_start - __start) * 1e6, 'dur': wall * 1e6}
+        if shapes: event['args'] = {'shapes': [list(shape) for shape in shapes]}
+        __events.append(event)
+
+
+def profiled(name=None):
+    """
+    Decorator that records a function call when profiling is enabled. The name defaults to the
+    module and function name (e.g. "sudoku.solve") or just the function name if it is the same as
+    the module name (e.g. "zerocross").
+    """
+    def decorator(func):
+        module = func.__module__.rpartition('.')[2]
+        record_name = name or (func.__name__ if module == func.__name__ else f"{module}.{func.__name__}")
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not __enabled: return func(*args, **kwargs)
+            state = __begin()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                __end(record_name, __shapes(args, kwargs), *state)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def __phase(name, arrays):
+    state = __begin()
+    try:
+        yield
+    finally:
+        __end(name, tuple(tuple(a.shape) for a in arrays), *state)
+
+
+class __NullPhase:
+    """A do-nothing context manager used for phases while profiling is disabled."""
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+__null_phase = __NullPhase()
+
+
+def phase(name, *arrays):
+    """
+    Context manager that records an internal phase of a function (such as "homomorphic_filter.fft")
+    when profiling is enabled. Any arrays given have their shapes recorded.
+    """
+    return __phase(name, arrays) if __enabled else __null_phase
+
+
+def stats():
+    """
+    Gets the recorded results as a dictionary of names to dictionaries with the number of calls,
+    total and maximum wall time, total CPU time (all in seconds), peak temporary bytes, and counts
+    of the argument shapes.
+    """
+    with __lock:
+        return {name: dict(s, shapes=dict(s['shapes'])) for name, s in __stats.items()}
+
+
+def save_json(path):
+    """Saves the results of stats() as a JSON file."""
+    import json
+    with open(path, 'w') as f:
+        json.dump(stats(), f, indent=2)
+
+
+def save_chrome_trace(path):
+    """Saves every recorded call as a Chrome trace event file (for chrome://tracing or Perfetto)."""
+    import json
+    with __lock:
+        events = list(__events)
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
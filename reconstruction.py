@@ -0,0 +1,137 @@
+"""
+Reconstruction of images from their projections (sinograms) using filtered back-projection.
+
+Sinograms have the detector positions along the rows and the projection angles along the columns
+(like images/sinogram.tif and skimage.transform.radon). A stack of sinograms (one per slice) can
+be reconstructed at once by giving a 3D array with the slices along the first axis.
+"""
+
+import numpy as np
+from scipy import fft
+
+from .utils import resolve_dtype
+from .profiling import profiled, phase
+
+__all__ = ["ramp_filter", "filtered_back_projection"]
+
+
+@profiled()
+def ramp_filter(n, window=None, dtype=None):
+    """
+    Creates the frequency response of the ramp filter for n (even or odd) detector positions in the
+    standard FFT order. It is computed from the band-limited spatial-domain ramp filter (the
+    Ram-Lak filter) which, unlike sampling |f| directly, does not lose the DC offset.
+
+    The window is an optional FourierFilter used for apodization (for example
+    FourierFilter.butterworth_low_pass(0.5, 4) or FourierFilter.gaussian(0.5)). Its cutoffs are
+    fractions of the Nyquist frequency, so the same window has the same effect for any n.
+    """
+    dtype = resolve_dtype(dtype)
+    d = np.minimum(np.arange(n), n - np.arange(n))  # circular distance of each tap from 0
+    h = np.zeros(n)
+    h[0] = 0.25
+    odd = d % 2 == 1
+    h[odd] = -1 / (np.pi * d[odd])**2
+    response = (2 * fft.fft(h).real).astype(dtype)  # h is symmetric so its transform is real
+    if window is not None:
+        response *= fft.ifftshift(window.evaluate(n, 1, dtype, spacing=2/n)[:, 0])  # Nyquist is 1
+    return response
+
+
+@profiled()
+def filtered_back_projection(sinogram, theta=None, window=None, output_size=None,
+                             chunk_size=None, workers=1, dtype=None):
+    """
+    Reconstructs an image from a sinogram (or a stack of sinograms) using filtered back-projection.
+
+    The angles theta (in degrees) default to evenly spaced angles from 0 to 180. All of the
+    projections are ramp-filtered with a single batched FFT, optionally with an apodization window.
+    The window is a FourierFilter whose cutoffs are fractions of the Nyquist frequency of the
+    detector sampling, independent of the number of detectors and of the internal FFT padding. For
+    example, FourierFilter.butterworth_low_pass(0.5, 4) rolls off at half of the Nyquist frequency
+    and FourierFilter.gaussian(1) is a Gaussian window with a standard deviation of the Nyquist
+    frequency. The filtered projections are then back-projected onto an output_size x
+    output_size image (default is the number of detector positions) with linear interpolation,
+    all of the angles in a chunk at once. The chunk_size is the number of angles per chunk, by
+    default chosen to keep the temporary arrays around 32 MiB. If workers is more than 1 the FFTs
+    and the chunks are run across that many threads.
+
+    The computations are done in the given floating-point dtype (default precision if not given).
+    Returns an output_size x output_size image or a stack of them.
+    """
+    dtype = resolve_dtype(dtype)
+    sinogram = np.asarray(sinogram)
+    is_stack = sinogram.ndim == 3
+    if not is_stack: sinogram = sinogram[np.newaxis]
+    if sinogram.ndim != 3: raise ValueError('sinogram must be 2D or a 3D stack of 2D sinograms')
+    n_slices, n_det, n_angles = sinogram.shape
+    theta = (np.arange(n_angles) * (180 / n_angles) if theta is None else
+             np.asarray(theta, float))
+    if theta.shape != (n_angles,): raise ValueError('theta must have one angle per column of sinogram')
+    size = n_det if output_size is None else output_size
+    itemsize = np.dtype(dtype).itemsize
+
+    # Ramp-filter all projections at once, padded to avoid wrap-around, in (slice, angle, det) order
+    with phase('reconstruction.filter', sinogram):
+        n = max(64, 1 << int(np.ceil(np.log2(2 * n_det))))
+        response = ramp_filter(n, window, dtype)[:n//2 + 1]
+        proj = np.ascontiguousarray(np.swapaxes(sinogram, 1, 2), dtype=dtype)
+        spectrum = fft.rfft(proj, n, axis=-1, workers=workers)
+        spectrum *= response
+        filtered = fft.irfft(spectrum, n, axis=-1, overwrite_x=True, workers=workers)
+        del proj, spectrum
+        # Add a zero on each side so positions outside of the detector interpolate to 0
+        padded = np.zeros((n_slices, n_angles, n_det + 2), dtype)
+        padded[..., 1:-1] = filtered[..., :n_det]
+        padded = padded.reshape(n_slices, -1)
+        del filtered
+
+    # Back-project the chunks of angles
+    if chunk_size is None:
+        chunk_size = max(1, (32 << 20) // (3 * (n_slices + 1) * size * size * itemsize))
+    chunks = [(start, min(start + chunk_size, n_angles)) for start in range(0, n_angles, chunk_size)]
+    angles = np.deg2rad(theta)
+    grid = np.arange(size, dtype=dtype) - size//2
+    args = (padded, np.cos(angles).astype(dtype), np.sin(angles).astype(dtype),
+            grid[:, np.newaxis], grid[np.newaxis, :], n_det, dtype)
+    with phase('reconstruction.backproject', padded):
+        if workers > 1 and len(chunks) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(workers) as pool:
+                # each thread sums its own share of the chunks to limit the number of partial images
+                parts = list(pool.map(lambda i: __back_project(chunks[i::workers], *args),
+                                      range(min(workers, len(chunks)))))
+            out = parts[0]
+            for part in parts[1:]: out += part
+        else:
+            out = __back_project(chunks, *args)
+    out *= np.pi / (2 * n_angles)
+    return out if is_stack else out[0]
+
+
+def __back_project(chunks, padded, cos_t, sin_t, rows, cols, n_det, dtype):
+    """
+    Sums the back-projections of the given chunks of angles (a list of (start, stop) pairs). The
+    padded projections are flattened to (slice, angle * (n_det+2)) so each chunk needs a single
+    gather per interpolation neighbor.
+    """
+    n_slices = padded.shape[0]
+    out = np.zeros((n_slices, rows.shape[0], cols.shape[1]), dtype)
+    for start, stop in chunks:
+        # Detector position of every output pixel for every angle in the chunk
+        c, s = cos_t[start:stop, np.newaxis, np.newaxis], sin_t[start:stop, np.newaxis, np.newaxis]
+        t = cols * c - rows * s
+        t += n_det//2 + 1  # the center plus the padding
+        np.clip(t, 0, n_det + 1, out=t)
+        i0 = t.astype(np.intp)
+        np.minimum(i0, n_det, out=i0)
+        t -= i0  # now the interpolation weights
+        i0 += (np.arange(start, stop) * (n_det + 2))[:, np.newaxis, np.newaxis]
+
+        # Linearly interpolate and sum over the angles
+        v0 = padded[:, i0]
+        i0 += 1
+        v1 = padded[:, i0]
+        v1 -= v0; v1 *= t; v1 += v0
+        out += v1.sum(axis=1)
+    return out
@@ -3,11 +3,13 @@
 import numpy as np
 import scipy.ndimage as ndi
 from .utils import nonzero, cos
+from .profiling import profiled, phase
 
 
 __all__ = ["get_straight_skeleton", "collapse_short_edges", "plot_skeleton_lines"]
 
 
+@profiled()
 def get_straight_skeleton(skeleton):
     """
     This performs a BFS search to find the straight skeleton from a skeleton. It first finds all
@@ -18,8 +20,9 @@ def get_straight_skeleton(skeleton):
     to_visit = skeleton.copy()
 
     # Get all of the special points in the skeleton
-    count_neighbors = ndi.convolve(to_visit.view(np.int8), np.ones((3, 3), np.int8), mode='constant') - 1
-    all_pts = set(map(tuple, np.transpose(np.where(to_visit & ((count_neighbors == 1) | (count_neighbors > 2))))))  # set of locations
+    with phase('skeleton.get_straight_skeleton.special_points', skeleton):
+        count_neighbors = ndi.convolve(to_visit.view(np.int8), np.ones((3, 3), np.int8), mode='constant') - 1
+        all_pts = set(map(tuple, np.transpose(np.where(to_visit & ((count_neighbors == 1) | (count_neighbors > 2))))))  # set of locations
 
     # For each of the special points search outward till be reach a destination.
     while all_pts:
@@ -54,6 +57,7 @@ def get_straight_skeleton(skeleton):
     return np.array(lines)
 
 
+@profiled()
 def collapse_short_edges(lines, min_length, min_length_for_endpoint=0):
     """
     Collapse short edges/lines by merging the endpoints of the line into a single point. This will
@@ -1,7 +1,9 @@
 from numpy import flatnonzero
 from numpy.lib.stride_tricks import as_strided
+from .profiling import profiled
 
 
+@profiled()
 def solve(board):
     """
     Solve a Sudoku board. The board is represented as a 9x9 array of values 0-9. The value 0
@@ -61,6 +63,7 @@ def is_valid_board(board, orig_board=None, allow_incomplete=True):
 
 
 ##### Utility Functions #####
+@profiled()
 def init_working(board):
     """
     Initialize and return the working array from a board. A working array is an 9x9x10 array of
@@ -94,6 +97,7 @@ def set_board_value(board, working, i, j, n):
     working[x:x+3,y:y+3,n] = False # clear n from the block
 
 
+@profiled()
 def find_simple_values(board, working, axis):
     """
     Find simple spots on the board/working to fill in values, depending on the axis:
@@ -115,6 +119,7 @@ def find_simple_values(board, working, axis):
     return True
 
 
+@profiled()
 def find_simple_values_in_block(board, working):
     """Find simple spots on the board/working to fill in values within a block."""
     # views the working array as blocks
@@ -133,6 +138,7 @@ def find_simple_values_in_block(board, working):
 
 ##### Methods for finding non-simple values #####
 # Note: these may not find any solutions on their own, but reduce the working space directly
+@profiled()
 def reduce_working_space(working):
     """
     Reduces the number of Trues in the working-space. Uses multiple methods and runs them until
@@ -175,6 +181,7 @@ def reduce_working_space(working):
     return looped
 
 
+@profiled()
 def __wr_method_1(working):
     """
     This method looks for rows/columns where all of one value lies in one block. The rest of the
@@ -194,6 +201,7 @@ def __wr_method_1(working):
         working[x,y:y+3,n] = False
 
 
+@profiled()
 def __wr_method_2(working):
     """
     This method looks for blocks where all of one value lies in a single row/column. The rest of
@@ -213,6 +221,7 @@ def __wr_method_2(working):
         working[i,j,n] = False
 
 
+@profiled()
 def __wr_method_3(working):
     """
     This method looks for cells that have 2 values and are in a row/column/block with another
@@ -244,6 +253,7 @@ def __wr_method_3(working):
         p.append((i,j))
 
 
+@profiled()
 def __wr_method_4(working, N=3):
     """
     This looks for groups of size N cells (default 3) in a single row/column/block that have <=N
@@ -1,7 +1,58 @@
 """General utility functions."""
 
 import numpy as np
-from numpy import fft
+from scipy import fft
+from .profiling import profiled, phase
+
+__default_dtype = np.dtype(np.float64)
+
+
+def set_default_dtype(dtype):
+    """
+    Sets the package-wide default floating-point precision used when a function is called without
+    an explicit dtype. This must be a real floating-point type such as float32 or float64; the
+    complex results of Fourier transforms use the complex type of the same precision.
+    """
+    global __default_dtype
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'f':
+        raise ValueError('dtype must be a real floating-point type such as float32 or float64')
+    __default_dtype = dtype
+
+
+def get_default_dtype():
+    """Gets the package-wide default floating-point precision (float64 unless changed)."""
+    return __default_dtype
+
+
+def resolve_dtype(dtype=None):
+    """
+    Gets the real floating-point dtype to compute with. If dtype is None the package-wide default is
+    used. Complex types are converted to the real type of the same precision.
+    """
+    if dtype is None: return __default_dtype
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'c': return np.finfo(dtype).dtype
+    if dtype.kind != 'f':
+        raise ValueError('dtype must be a floating-point type such as float32 or float64')
+    return dtype
+
+
+def complex_dtype(dtype=None):
+    """Gets the complex dtype with the same precision as the given (or default) dtype."""
+    return np.result_type(resolve_dtype(dtype), np.complex64)
+
+
+def as_float(arr, dtype=None):
+    """
+    Converts an array to the given (or default) floating-point precision. Complex arrays are
+    converted to the complex type of the same precision. No copy is made if the array already has
+    the right type.
+    """
+    arr = np.asarray(arr)
+    dtype = complex_dtype(dtype) if arr.dtype.kind == 'c' else resolve_dtype(dtype)
+    return arr.astype(dtype, copy=False)
+
 
 def nonzero(x):
     """
@@ -10,29 +61,37 @@ def nonzero(x):
     """
     if not isinstance(x, np.ndarray):
         return np.finfo(float).eps if x == 0 else x
-    x[x == 0] = np.finfo(float).eps
+    x[x == 0] = np.finfo(x.dtype if x.dtype.kind == 'f' else float).eps
     return x
 
 
-def psf2otf(psf, shape):
+@profiled()
+def psf2otf(psf, shape, dtype=None):
     """
     Convert a PSF to an OTF. This is essentially fft.fft2(psf, shape) except it also includes a
     minor shift of the data so that the center of the PSF is at (0,0) before the Fourier transform
-    is computed but after padding.
+    is computed but after padding. The OTF has the complex type matching dtype (default precision
+    if not given).
     """
+    psf = as_float(psf, dtype)
     psf_shape = psf.shape
     psf = np.pad(psf, ((0, shape[0] - psf_shape[0]), (0, shape[1] - psf_shape[1])), 'constant')
     psf = np.roll(psf, (-(psf_shape[0]//2), -(psf_shape[1]//2)), axis=(0,1)) # shift PSF so center is at (0,0)
-    return fft.fft2(psf)
+    with phase('utils.psf2otf.fft', psf):
+        return fft.fft2(psf, overwrite_x=True)
 
 
-def otf2psf(otf, shape):
+@profiled()
+def otf2psf(otf, shape, dtype=None):
     """
     Convert an OTF to a PSF. This is essentially fft.ifft2(otf, shape) except it also includes a
     minor shift of the data so that the center of the PSF is moved back to the middle after the
-    inverse Fourier transform is computed but before cropping.
+    inverse Fourier transform is computed but before cropping. The PSF has the complex type
+    matching dtype (default precision if not given).
     """
-    psf = fft.ifft2(otf)
+    otf = np.asarray(otf).astype(complex_dtype(dtype), copy=False)
+    with phase('utils.otf2psf.fft', otf):
+        psf = fft.ifft2(otf)
     psf = np.roll(psf, (shape[0]//2, shape[1]//2), axis=(0,1)) # shift PSF so center is in middle
     return psf[:shape[0], :shape[1]]
 
@@ -41,8 +100,73 @@ def cos(pt0, pt1, pt2):
     """
     Calculate the cosine of the angle between the vectors from pt0 to pt1 and
     pt0 to pt2. This is done using the dot product and normalization.
+
+    The points can also be arrays of points (with the coordinates along the last
+    axis) in which case the cosines of all of the angles are calculated at once.
     """
-    v1 = (pt1 - pt0).astype(float)
-    v2 = (pt2 - pt0).astype(float)
-    return v1.dot(v2) / np.sqrt(nonzero((v1*v1).sum()*(v2*v2).sum()))
+    dtype = resolve_dtype()
+    v1 = np.subtract(pt1, pt0, dtype=dtype)
+    v2 = np.subtract(pt2, pt0, dtype=dtype)
+    dot = np.einsum('...i,...i', v1, v2)
+    norms = np.einsum('...i,...i', v1, v1) * np.einsum('...i,...i', v2, v2)
+    return dot / np.sqrt(nonzero(norms))
+
 
+def corner_cosines(triples):
+    """
+    Calculate the cosines of many angles at once. The triples are an array of shape (..., 3, 2)
+    where each set of 3 points is (pt0, pt1, pt2) as for cos(), so the angle is at pt0.
+    """
+    triples = np.asarray(triples)
+    return cos(triples[..., 0, :], triples[..., 1, :], triples[..., 2, :])
+
+
+def __polygon_points(contours):
+    """
+    Gets the points of closed polygon(s) along with the indices of the previous and next point of
+    each point. The contours are an array of shape (..., N, 2) (or (..., N, 1, 2) like OpenCV) or
+    a list of arrays with different numbers of points. For a list the points of all of the
+    polygons are concatenated and the starting index of each polygon is also returned.
+    """
+    if isinstance(contours, (list, tuple)):
+        pts = [np.reshape(contour, (-1, 2)) for contour in contours]
+        lengths = np.array([len(p) for p in pts], dtype=np.intp)
+        if (lengths == 0).any(): raise ValueError('contours must have at least one point each')
+        starts = np.cumsum(lengths) - lengths
+        offsets, sizes = np.repeat(starts, lengths), np.repeat(lengths, lengths)
+        local = np.arange(lengths.sum()) - offsets
+        prev, nxt = offsets + (local - 1) % sizes, offsets + (local + 1) % sizes
+        pts = np.concatenate(pts) if pts else np.empty((0, 2))
+        return pts, pts[prev], pts[nxt], starts
+    pts = np.asarray(contours)
+    if pts.ndim >= 3 and pts.shape[-2] == 1: pts = pts[..., 0, :]  # OpenCV contour
+    return pts, np.roll(pts, 1, axis=-2), np.roll(pts, -1, axis=-2), None
+
+
+@profiled()
+def polygon_cosines(contours):
+    """
+    Calculate the cosine of the angle at every vertex of closed polygon(s) (i.e. contours) in a
+    single vectorized pass. The contours are an array of shape (..., N, 2) for one or more
+    polygons with N vertices each, in which case an array of shape (..., N) is returned, or a list
+    of arrays of points (like from cv2.findContours()), in which case a list of arrays is returned.
+    """
+    pts, prev, nxt, starts = __polygon_points(contours)
+    cosines = cos(pts, prev, nxt)
+    if starts is None: return cosines
+    return np.split(cosines, starts[1:]) if len(starts) else []
+
+
+@profiled()
+def squareness(contours):
+    """
+    Scores how square (or rectangular) closed polygon(s) are as the maximum absolute cosine of
+    their vertex angles. A score of 0 means every angle is a right angle; quadrilaterals with a
+    score below about 0.3 are typically accepted as squares. The contours are given as for
+    polygon_cosines() and one score is returned for each polygon.
+    """
+    pts, prev, nxt, starts = __polygon_points(contours)
+    cosines = np.abs(cos(pts, prev, nxt))
+    if starts is None: return cosines.max(-1)
+    if len(starts) == 0: return np.empty(0, cosines.dtype)
+    return np.maximum.reduceat(cosines, starts)
@@ -11,6 +11,8 @@ import PIL.ImageDraw
 
 import cv2
 
+from .profiling import profiled, phase
+
 
 def bgr2rgb(im):
     """
@@ -38,6 +40,7 @@ def __image_encode(im, fps=""):
     im_out.save(f, format='png')
     return f.getvalue()
 
+@profiled()
 def run_video(process_frame=lambda im:im, fps=None, width=640, camera_num=0, return_orig=False):
     """
     Runs OpenCV video from a connected camera as Jupyter notebook output. Each frame from the camera
@@ -91,11 +94,13 @@ def run_video(process_frame=lambda im:im, fps=None, width=640, camera_num=0, ret
 
                 # Process the frame
                 start = time()  # start time for computing FPS
-                im = process_frame(frame)
+                with phase('video.process_frame', frame):
+                    im = process_frame(frame)
                 stop = time()
 
                 # Update the display
-                image.value = __image_encode(im, round(1/(stop-start), 1))
+                with phase('video.encode', im):
+                    image.value = __image_encode(im, round(1/(stop-start), 1))
             except KeyboardInterrupt: break  # watch for a keyboard interrupt (stop button) to stop the script gracefully
         __capture_frames_thread.is_processing = False
         return frame if return_orig else im  # returns the final processed image or original frame
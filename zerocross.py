@@ -1,3 +1,7 @@
+from .profiling import profiled
+
+
+@profiled()
 def zerocross(im):
     """Finds the zero-crossing in the given image, returning a binary image."""
     from numpy import pad